@@ -1,22 +1,20 @@
-from PIL import Image, ImageDraw
+from PIL import Image
+import numpy as np
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 def create_tetris_icon(size):
-    # Create a new image with a black background
-    img = Image.new('RGB', (size, size), 'black')
-    draw = ImageDraw.Draw(img)
-    
     # Calculate block size (divide icon into 4x4 grid)
     block_size = size // 4
     padding = block_size // 8  # Small padding between blocks
     
     # Colors for Tetris pieces
-    colors = [
+    colors = np.array([
         (0, 240, 240),  # Cyan (I piece)
         (240, 160, 0),  # Orange (L piece)
         (0, 0, 240),    # Blue (J piece)
         (240, 240, 0),  # Yellow (O piece)
-    ]
+    ], dtype=np.int16)
     
     # Draw an arrangement of Tetris blocks that form a "T" shape
     blocks = [
@@ -28,31 +26,31 @@ def create_tetris_icon(size):
         [(0, 3), (2, 3)]
     ]
     
-    # Draw each set of blocks with its color
+    # Block extent within its grid cell (the old width-2 edge lines reached
+    # one pixel past the padding)
+    start = padding
+    end = min(block_size - padding + 2, block_size)
+    
+    pixels = np.zeros((size, size, 3), dtype=np.uint8)
+    
+    # Stamp each block with a slight 3D effect
     for color_idx, block_set in enumerate(blocks):
         color = colors[color_idx % len(colors)]
+        highlight_color = np.minimum(color + 40, 255)
+        shadow_color = np.maximum(color - 40, 0)
         for x, y in block_set:
-            # Calculate block position with padding
-            left = x * block_size + padding
-            top = y * block_size + padding
-            right = (x + 1) * block_size - padding
-            bottom = (y + 1) * block_size - padding
-            
-            # Draw block with a slight 3D effect
+            block = pixels[y * block_size + start:y * block_size + end,
+                           x * block_size + start:x * block_size + end]
             # Main block
-            draw.rectangle([left, top, right, bottom], fill=color)
-            
+            block[:] = color
             # Highlight (top and left edges)
-            highlight_color = tuple(min(c + 40, 255) for c in color)
-            draw.line([left, top, right, top], fill=highlight_color, width=2)
-            draw.line([left, top, left, bottom], fill=highlight_color, width=2)
-            
+            block[:2] = highlight_color
+            block[:, :2] = highlight_color
             # Shadow (bottom and right edges)
-            shadow_color = tuple(max(c - 40, 0) for c in color)
-            draw.line([left, bottom, right, bottom], fill=shadow_color, width=2)
-            draw.line([right, top, right, bottom], fill=shadow_color, width=2)
+            block[-2:] = shadow_color
+            block[:, -2:] = shadow_color
     
-    return img
+    return Image.fromarray(pixels, 'RGB')
 
 def generate_mac_icons():
     """Generate icons in all sizes needed for macOS"""
@@ -63,10 +61,14 @@ def generate_mac_icons():
     # Required sizes for macOS icons
     sizes = [16, 32, 64, 128, 256, 512, 1024]
     
-    for size in sizes:
-        icon = create_tetris_icon(size)
-        icon.save(f'icons/icon_{size}x{size}.png')
-        print(f"Generated {size}x{size} icon")
+    def save_icon(size):
+        create_tetris_icon(size).save(f'icons/icon_{size}x{size}.png')
+        return size
+    
+    # PNG encoding releases the GIL, so sizes can be saved in parallel on multi-core machines
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        for size in executor.map(save_icon, sizes):
+            print(f"Generated {size}x{size} icon")
 
 if __name__ == "__main__":
     generate_mac_icons() 
\ No newline at end of file
@@ -1,95 +1,126 @@
+import functools
 import os
-import wave
-import struct
-import math
 import numpy as np
+from scipy.io import wavfile
 
-def generate_square_wave(frequency, duration, amplitude=0.5, sample_rate=44100):
-    """Generate a square wave with the given frequency and duration."""
+SAMPLE_RATE = 44100  # Sample rate of every generated WAV file
+
+def generate_square_wave(frequency, duration, amplitude=0.5, sample_rate=SAMPLE_RATE, out=None):
+    """Generate a square wave with the given frequency and duration.
+
+    If out is given, the wave is written into that buffer instead of a new array.
+    """
+    num_samples = int(duration * sample_rate)
+    note = _square_note(frequency, num_samples, amplitude, sample_rate)
+    if out is None:
+        return note.copy()
+    out[:num_samples] = note
+    return out
+
+@functools.lru_cache(maxsize=None)
+def _square_note(frequency, num_samples, amplitude, sample_rate):
+    """Return a cached square wave note, shared by every repeat of the same pitch and length."""
+    note = square_from_phase(np.arange(num_samples) * (frequency / sample_rate), amplitude)
+    note.setflags(write=False)
+    return note
+
+def square_from_phase(phase, amplitude):
+    """Turn a phase measured in cycles into a square wave of the given amplitude."""
+    # Square wave is 1 for the first half of each cycle, -1 for the other half
+    frac = phase - np.floor(phase)
+    return np.where(frac < 0.5, amplitude, -amplitude).astype(np.float32)
+
+def square_sweep(start_freq, end_freq, duration, amplitude, sample_rate, decay=False):
+    """Generate a square wave whose frequency moves linearly from start_freq to end_freq.
+
+    The phase is freq(t) * t. With decay, the volume fades linearly to silence.
+    """
     num_samples = int(duration * sample_rate)
-    samples = []
-    for i in range(num_samples):
-        t = i / sample_rate
-        # Square wave is 1 for half the period, -1 for the other half
-        sample = amplitude if math.sin(2 * math.pi * frequency * t) >= 0 else -amplitude
-        samples.append(sample)
+    slope = (end_freq - start_freq) / duration
+    t = np.arange(num_samples) / sample_rate
+    samples = square_from_phase((start_freq + slope * t) * t, amplitude)
+    if decay:
+        samples *= 1 - np.arange(num_samples, dtype=np.float32) / num_samples
     return samples
 
-def save_wave_file(filename, samples, sample_rate=44100):
-    """Save samples as a WAV file."""
-    with wave.open(os.path.join("sounds", filename), 'w') as wave_file:
-        wave_file.setnchannels(1)  # Mono
-        wave_file.setsampwidth(2)  # 2 bytes per sample
-        wave_file.setframerate(sample_rate)
-        
-        # Convert samples to bytes
-        sample_data = []
-        for sample in samples:
-            # Convert to 16-bit integer
-            sample = int(sample * 32767)
-            sample_data.append(struct.pack('h', sample))
-            
-        wave_file.writeframes(b''.join(sample_data))
+def apply_envelope(samples, attack_ramp, release_ramp):
+    """Fade a note in and out in place using precomputed linear ramps."""
+    attack = min(len(attack_ramp), len(samples))
+    samples[:attack] *= attack_ramp[:attack]
+    release = min(len(release_ramp), len(samples))
+    if release:
+        samples[-release:] *= release_ramp[release - 1::-1]
+
+def normalize(samples, peak):
+    """Scale samples in place so that their loudest sample reaches the given peak."""
+    max_amplitude = np.abs(samples).max()
+    if max_amplitude > 0:
+        np.multiply(samples, peak / max_amplitude, out=samples)
+    return samples
+
+def notes_length(notes, sample_rate=SAMPLE_RATE):
+    """Return the number of samples needed to play (frequency, duration) notes in sequence."""
+    return sum(int(duration * sample_rate) for _, duration in notes)
+
+def render_notes(notes, amplitude, sample_rate=SAMPLE_RATE, out=None, envelope=None):
+    """Play (frequency, duration) notes one after another into a single buffer.
+
+    The buffer is allocated up front (or passed in as out) and every note is
+    written into its own slice, optionally shaped by an (attack, release) envelope.
+    """
+    if out is None:
+        out = np.empty(notes_length(notes, sample_rate), dtype=np.float32)
+    offset = 0
+    for freq, duration in notes:
+        num_samples = int(duration * sample_rate)
+        note_samples = out[offset:offset + num_samples]
+        generate_square_wave(freq, duration, amplitude, sample_rate, out=note_samples)
+        if envelope is not None:
+            apply_envelope(note_samples, *envelope)
+        offset += num_samples
+    return out
+
+def save_wave_file(filename, samples, sample_rate=SAMPLE_RATE, loops=1):
+    """Save samples as a mono 16-bit WAV file, played loops times back to back."""
+    # Convert to 16-bit integers in one pass
+    samples = np.clip(np.asarray(samples, dtype=np.float32), -1.0, 1.0)
+    pcm = (samples * 32767.0).astype(np.int16)
+    if loops > 1:
+        # Repeat after the int16 conversion to copy half as many bytes
+        pcm = np.tile(pcm, loops)
+    wavfile.write(os.path.join("sounds", filename), sample_rate, pcm)
 
 def create_move_sound():
     """Create a short descending tone for piece movement."""
     # GameBoy-style descending tone
-    samples = []
-    for freq in [440, 392, 349]:  # A4, G4, F4
-        samples.extend(generate_square_wave(freq, 0.05, 0.3))
-    return samples
+    freqs = [440, 392, 349]  # A4, G4, F4
+    return render_notes([(freq, 0.05) for freq in freqs], 0.3)
 
 def create_rotate_sound():
     """Create a quick ascending arpeggio for piece rotation."""
     # GameBoy-style ascending arpeggio
-    samples = []
-    for freq in [440, 554, 659, 880]:  # A4, C#5, E5, A5
-        samples.extend(generate_square_wave(freq, 0.03, 0.3))
-    return samples
+    freqs = [440, 554, 659, 880]  # A4, C#5, E5, A5
+    return render_notes([(freq, 0.03) for freq in freqs], 0.3)
 
 def create_drop_sound():
     """Create a low impact sound for piece dropping."""
     # GameBoy-style impact sound
-    samples = []
-    # Start with a high frequency that quickly drops
-    duration = 0.1
-    sample_rate = 32768
-    num_samples = int(duration * sample_rate)
-    for i in range(num_samples):
-        t = i / sample_rate
-        freq = 880 * (1 - t/duration)  # Sweep from 880Hz to 0Hz
-        sample = 0.4 if math.sin(2 * math.pi * freq * t) >= 0 else -0.4
-        # Add decay
-        sample *= 1 - (i / num_samples)
-        samples.append(sample)
-    return samples
+    # Start with a high frequency that quickly drops, with decay
+    return square_sweep(880, 0, 0.1, 0.4, 32768, decay=True)  # Sweep from 880Hz to 0Hz
 
 def create_clear_sound():
     """Create an upward sweep sound for line clearing."""
     # GameBoy-style clear sound
-    samples = []
-    duration = 0.2
-    sample_rate = 32768
-    num_samples = int(duration * sample_rate)
-    for i in range(num_samples):
-        t = i / sample_rate
-        freq = 440 + (880 * t / duration)  # Sweep from 440Hz to 1320Hz
-        sample = 0.4 if math.sin(2 * math.pi * freq * t) >= 0 else -0.4
-        samples.append(sample)
-    return samples
+    return square_sweep(440, 1320, 0.2, 0.4, 32768)  # Sweep from 440Hz to 1320Hz
 
 def create_game_over_sound():
     """Create a descending sequence for game over."""
     # GameBoy-style game over sound
-    samples = []
     freqs = [880, 659, 554, 440, 330]  # A5, E5, C#5, A4, E4
-    for freq in freqs:
-        samples.extend(generate_square_wave(freq, 0.1, 0.4))
-    return samples
+    return render_notes([(freq, 0.1) for freq in freqs], 0.4)
 
 def create_tetris_sound():
     """Creates a special sound for clearing 4 rows at once (Tetris)"""
-    samples = []
     # Base frequencies for a C major chord progression (C -> F -> G -> C)
     base_freqs = [
         [523.25, 659.25, 783.99],  # C major (C5, E5, G5)
@@ -102,34 +133,40 @@ def create_tetris_sound():
     durations = [0.06, 0.06, 0.06, 0.12]  # Shorter notes for arpeggio, longer for final chord
     volumes = [0.3, 0.3, 0.3, 0.4]  # Lower volumes to prevent clipping
     
+    # Arpeggiated chords play each note in turn, the final chord plays them at once
+    note_lengths = [int(duration * SAMPLE_RATE) for duration in durations]
+    num_samples = sum(
+        len(chord) * note_length
+        for chord, note_length in zip(base_freqs[:-1], note_lengths[:-1])
+    ) + note_lengths[-1]
+    samples = np.empty(num_samples, dtype=np.float32)
+    offset = 0
+    
     # Create an arpeggio effect with the chord progression
     for chord_idx, chord in enumerate(base_freqs):
+        duration = durations[chord_idx]
+        note_length = note_lengths[chord_idx]
         # For the final chord, play all notes together
         if chord_idx == len(base_freqs) - 1:
-            chord_samples = None
-            for freq in chord:
-                wave = generate_square_wave(freq, durations[chord_idx], volumes[chord_idx] / len(chord))
-                if chord_samples is None:
-                    chord_samples = wave
-                else:
-                    chord_samples = [sum(x) for x in zip(chord_samples, wave)]
-            samples.extend(chord_samples)
+            voices = np.stack([
+                generate_square_wave(freq, duration, volumes[chord_idx] / len(chord))
+                for freq in chord
+            ])
+            voices.sum(axis=0, out=samples[offset:offset + note_length])
+            offset += note_length
         else:
             # For other chords, play notes in sequence for arpeggio effect
-            for freq in chord:
-                samples.extend(generate_square_wave(freq, durations[chord_idx], volumes[chord_idx]))
+            arpeggio_length = note_length * len(chord)
+            render_notes([(freq, duration) for freq in chord], volumes[chord_idx],
+                         out=samples[offset:offset + arpeggio_length])
+            offset += arpeggio_length
     
     # Normalize samples to prevent clipping
-    max_amplitude = max(abs(min(samples)), abs(max(samples)))
-    if max_amplitude > 0:
-        scale_factor = 0.9 / max_amplitude  # Leave some headroom
-        samples = [s * scale_factor for s in samples]
-    
-    return samples
+    return normalize(samples, 0.9)  # Leave some headroom
 
 def create_background_music():
     """Creates the Yorcksche Marsch background music directly from the score"""
-    sample_rate = 44100
+    sample_rate = SAMPLE_RATE
     tempo = 192  # Quarter notes per minute
     quarter_duration = 60.0 / tempo  # Duration of a quarter note in seconds
     
@@ -319,62 +356,53 @@ def create_background_music():
         (note_freq(-8), quarter_duration),   # B3 quarter
     ]
     
-    samples = []
-    bass_samples = []
+    # Linear fade ramps, computed once and shared by every note
+    def fade_ramp(seconds):
+        length = int(seconds * sample_rate)
+        return np.arange(length, dtype=np.float32) / length
+    
+    # The melody buffer spans the longer voice and doubles as the mix buffer
+    melody_length = notes_length(melody, sample_rate)
+    bass_length = notes_length(bass, sample_rate)
+    max_length = max(melody_length, bass_length)
+    samples = np.zeros(max_length, dtype=np.float32)
     
     # Generate melody with attack and release (reduced volume from 0.3 to 0.15)
-    for freq, duration in melody:
-        note_samples = generate_square_wave(freq, duration, 0.15)
-        # Add attack
-        attack_samples = int(0.02 * sample_rate)  # 20ms attack
-        for i in range(min(attack_samples, len(note_samples))):
-            note_samples[i] *= (i / attack_samples)
-        # Add release
-        release_samples = int(0.03 * sample_rate)  # 30ms release
-        for i in range(min(release_samples, len(note_samples))):
-            note_samples[-(i+1)] *= (i / release_samples)
-        samples.extend(note_samples)
+    melody_envelope = (fade_ramp(0.02), fade_ramp(0.03))  # 20ms attack, 30ms release
+    render_notes(melody, 0.15, sample_rate, out=samples[:melody_length], envelope=melody_envelope)
     
     # Generate bass with longer attack and release (reduced volume from 0.2 to 0.1)
-    for freq, duration in bass:
-        note_samples = generate_square_wave(freq, duration, 0.1)
-        # Add attack
-        attack_samples = int(0.03 * sample_rate)  # 30ms attack
-        for i in range(min(attack_samples, len(note_samples))):
-            note_samples[i] *= (i / attack_samples)
-        # Add release
-        release_samples = int(0.04 * sample_rate)  # 40ms release
-        for i in range(min(release_samples, len(note_samples))):
-            note_samples[-(i+1)] *= (i / release_samples)
-        bass_samples.extend(note_samples)
-    
-    # Ensure both arrays are the same length
-    max_length = max(len(samples), len(bass_samples))
-    samples.extend([0] * (max_length - len(samples)))
-    bass_samples.extend([0] * (max_length - len(bass_samples)))
+    bass_envelope = (fade_ramp(0.03), fade_ramp(0.04))  # 30ms attack, 40ms release
+    bass_samples = render_notes(bass, 0.1, sample_rate, envelope=bass_envelope)
     
-    # Mix melody and bass
-    mixed_samples = [samples[i] + bass_samples[i] for i in range(max_length)]
+    # Mix the bass into the melody buffer in place
+    mixed_samples = samples
+    np.add(mixed_samples[:bass_length], bass_samples, out=mixed_samples[:bass_length])
     
     # Normalize with a lower target amplitude (reduced from 0.95 to 0.7)
-    max_amplitude = max(abs(min(mixed_samples)), abs(max(mixed_samples)))
-    if max_amplitude > 0:
-        scale_factor = 0.7 / max_amplitude
-        mixed_samples = [s * scale_factor for s in mixed_samples]
-    
-    # Loop the sequence 2 times (it's twice as long now)
-    return mixed_samples * 2
+    return normalize(mixed_samples, 0.7)
+
+# Every generated sound, keyed by the name of its WAV file in sounds/
+SOUND_FACTORIES = {
+    'move': create_move_sound,
+    'rotate': create_rotate_sound,
+    'drop': create_drop_sound,
+    'clear': create_clear_sound,
+    'tetris': create_tetris_sound,
+    'game_over': create_game_over_sound,
+    'background': create_background_music,
+}
+
+# How many times each sound is repeated in its WAV file (default once)
+SOUND_LOOPS = {
+    'background': 2,  # Loop the music 2 times (it's twice as long now)
+}
 
 def generate_main():
     """Generate all sound effects"""
     # Generate and save all sound effects
-    save_wave_file('move.wav', create_move_sound())
-    save_wave_file('rotate.wav', create_rotate_sound())
-    save_wave_file('drop.wav', create_drop_sound())
-    save_wave_file('clear.wav', create_clear_sound())
-    save_wave_file('tetris.wav', create_tetris_sound())
-    save_wave_file('game_over.wav', create_game_over_sound())
-    save_wave_file('background.wav', create_background_music())
+    for name, create_sound in SOUND_FACTORIES.items():
+        save_wave_file(f'{name}.wav', create_sound(), loops=SOUND_LOOPS.get(name, 1))
     
     print("Sound effects generated successfully!")
 